@@ -3,13 +3,13 @@ Arifi-01 Protocol Runner
 ========================
 """
 
-from .arifi_protocol_runner import main, generate_code, analyze_code, evolution_step
+from .arifi_protocol_runner import main, generate_with_ai, analyze_file, attempt_evolve
 
 __all__ = [
     "main",
-    "generate_code",
-    "analyze_code",
-    "evolution_step",
+    "generate_with_ai",
+    "analyze_file",
+    "attempt_evolve",
 ]
 
 __version__ = "0.1.0"
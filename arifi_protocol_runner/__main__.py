@@ -0,0 +1,5 @@
+"""Entry point for ``python -m arifi_protocol_runner``."""
+
+from .arifi_protocol_runner import main
+
+main()
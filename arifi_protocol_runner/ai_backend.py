@@ -11,70 +11,399 @@ Usage:
     backend = AIBackend()
     code = backend.generate_code(prompt, language="python")
     repaired = backend.repair_code(code, analysis_report)
+
+    # or, from async code, overlap several requests:
+    results = await backend.agenerate_many([prompt_a, prompt_b])
 """
 
 import os
-import time
+import re
 import json
-from typing import Optional, Dict
+import time
+import asyncio
+import hashlib
+import tempfile
+import importlib.util
+from pathlib import Path
+from typing import Optional, Dict, List, Callable
 
 # Try import openai if available
 try:
+    import httpx  # type: ignore  # installed with openai
     import openai  # type: ignore
+    from openai import AsyncOpenAI  # type: ignore
     OPENAI_PKG = True
 except Exception:
     OPENAI_PKG = False
 
+# Optional: tenacity drives retries of transient API errors
+try:
+    from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential  # type: ignore
+    TENACITY_PKG = True
+except Exception:
+    TENACITY_PKG = False
+
+# HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+HTTP2 = importlib.util.find_spec("h2") is not None
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # must be set by user if using OpenAI
 
+# local response cache: identical requests are answered from disk
+CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "arifi"
+CACHE_TTL = 7 * 24 * 3600  # seconds; None = entries never expire
+
+# backoff for rate limits / transient API errors (seconds)
+RETRY_MIN_WAIT = 1
+RETRY_MAX_WAIT = 30
+
+# fenced code block, with or without a language tag
+_CODE_FENCE_RE = re.compile(r"```(?:\w+)?\n([\s\S]*?)\n```")
+
+# opening fence only, for matching incrementally while a response streams in
+_FENCE_OPEN_RE = re.compile(r"```\w*\n")
+
+# tagged sections used by repair_code_batch to carry several files in one request
+_FILE_SECTION_RE = re.compile(r"<<FILE (\d+)>>\n([\s\S]*?)\n<<END \1>>")
+
+# Static prompt material. Everything in _SYSTEM_PREFIX (and the fixed head of each
+# user message) is byte-identical across calls so the provider's prompt cache can
+# reuse it; per-call data (prompt, code, report) always goes at the very end.
+# Keep it free of timestamps/ids, and keep it above ~1024 tokens (the OpenAI
+# cache granularity).
+_SYSTEM_PREFIX = r'''You are the code-writing and code-repair engine of the Arifi-01 Protocol Runner.
+You receive either a natural-language task to implement, or an existing source file together with a static-analysis report to fix.
+The program that calls you writes your answer straight to disk and then runs linters and type checkers on it, so the answer must be machine-usable.
+
+General rules (apply to every request):
+1. Write correct, well-documented, and testable code.
+2. If asked for JavaScript produce idiomatic Node.js-compatible JS (CommonJS or ESM as requested). Prefer CommonJS when nothing is specified.
+3. If asked for TypeScript produce strict-mode compatible TypeScript with explicit types on exported functions.
+4. If asked for Python produce Python 3.8+ code with functions/classes and minimal external deps. Use only the standard library unless the task names a package.
+5. Always return the code inside a single fenced block in triple backticks, tagged with the language (```python, ```javascript, ```typescript).
+6. Do not write prose before or after the code block unless a short JSON metadata block is explicitly requested; put any explanation in code comments.
+7. The file must be runnable as-is: no placeholders such as "..." or "TODO: implement", no missing imports, no references to files that do not exist.
+8. Include a short module docstring or header comment describing what the file does.
+9. Include example usage guarded so it only runs when the file is executed directly (Python: if __name__ == "__main__":, Node.js: if (require.main === module)).
+10. Validate inputs at public entry points and raise/throw a clear error (Python: ValueError/TypeError, JavaScript: TypeError/RangeError) instead of failing silently.
+
+Python style, checked by flake8 and mypy:
+- Follow PEP 8: 4-space indentation, two blank lines between top-level definitions, lines no longer than 79 characters.
+- No unused imports or variables, no bare except, no mutable default arguments.
+- Add type hints to every function signature, including the return type; avoid Any where a concrete type is possible.
+- Keep functions small; cyclomatic complexity (measured with radon) should stay at rank A or B.
+- End the file with exactly one newline.
+
+JavaScript/TypeScript style, checked by eslint:
+- Use const/let (never var), strict equality (===, !==), semicolons, and 2-space indentation.
+- No unused variables, no implicit globals, no console output outside the example usage block.
+- Document exported functions with JSDoc comments.
+
+When repairing code:
+- Fix every problem listed in the analysis report, not only the first one.
+- Preserve the original behaviour, public names, and example usage unless they are the cause of an error.
+- Do not introduce new dependencies to silence a warning.
+- Return the complete repaired file, never a diff or a fragment.
+
+Example of a generation request and the expected answer shape:
+
+Task:
+Write a function that adds two numbers.
+Target language: python
+
+Answer:
+```python
+"""Simple arithmetic helpers."""
+
+
+def tambah(a: float, b: float) -> float:
+    """Return the sum of a and b."""
+    return a + b
+
+
+if __name__ == "__main__":
+    print("2 + 3 =", tambah(2, 3))
+```
+
+Task:
+Write a function that applies a percentage discount to an amount.
+Target language: javascript
+
+Answer:
+```javascript
+'use strict';
+
+/**
+ * Apply a percentage discount to an amount.
+ * @param {number} amount - original amount, must be >= 0
+ * @param {number} discountPercent - discount between 0 and 100
+ * @returns {number} the discounted amount
+ */
+function applyDiscount(amount, discountPercent) {
+  if (typeof amount !== 'number' || typeof discountPercent !== 'number') {
+    throw new TypeError('amount and discountPercent must be numbers');
+  }
+  if (amount < 0 || discountPercent < 0 || discountPercent > 100) {
+    throw new RangeError('amount must be >= 0 and discountPercent within 0..100');
+  }
+  return amount - (amount * discountPercent) / 100;
+}
+
+module.exports = { applyDiscount };
+
+if (require.main === module) {
+  console.log('100 with 15% off =', applyDiscount(100, 15));
+}
+```
+
+Example of a repair request and the expected answer shape:
+
+Code:
+```
+import os
+def halo(nama):
+  return "Halo, " + nama
+```
+Analysis report (lint/errors):
+{"flake8":{"rc":1,"stdout":"f.py:1:1: F401 'os' imported but unused\nf.py:2:1: E302 expected 2 blank lines, found 0\nf.py:3:3: E111 indentation is not a multiple of 4"},"mypy":{"rc":1,"stdout":"f.py:2: error: Function is missing a type annotation"}}
+
+Answer:
+```python
+def halo(nama: str) -> str:
+    return "Halo, " + nama
+```
+'''
+
+_GENERATE_HEAD = (
+    "Requirements: produce a full, runnable implementation, and include comments and example usage.\n"
+    "Return only the code block in triple backticks.\n\n"
+)
+_REPAIR_HEAD = (
+    "Read the code and the analysis report below and return a corrected, runnable version.\n"
+    "Please return only the repaired code inside triple backticks, and nothing else.\n\n"
+)
+_REPAIR_BATCH_HEAD = (
+    "Read each code file and its analysis report below and return a corrected, runnable version of every file.\n"
+    "Return every repaired file inside its own <<FILE i>> ... <<END i>> section (same i as below), "
+    "with the code of each file inside triple backticks, and nothing else.\n\n"
+)
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms), if any."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # HTTP-date form; fall back to backoff
+    return None
+
+if TENACITY_PKG:
+    _backoff = wait_random_exponential(multiplier=RETRY_MIN_WAIT, min=RETRY_MIN_WAIT, max=RETRY_MAX_WAIT)
+
+    def _wait_retry_after(retry_state) -> float:
+        """
+        Capped exponential backoff with jitter, but never sooner than the
+        server's Retry-After: retrying earlier only burns quota on another 429.
+        """
+        backoff = _backoff(retry_state)
+        delay = _retry_after(retry_state.outcome.exception())
+        return backoff if delay is None else max(delay, backoff)
+
+def _one_newline(code: str) -> str:
+    """code ending in exactly one newline, as written to disk (flake8 W292/W391)."""
+    return code.rstrip("\n") + "\n"
+
+def _report_json(report: Dict) -> str:
+    """
+    Analysis report as sent to the model: compact JSON of the failing analyzers
+    only, without empty fields. Passing tools and indentation are just input
+    tokens.
+    """
+    failing = {
+        name: {k: v for k, v in res.items() if v not in ("", None)}
+        for name, res in report.items()
+        if isinstance(res, dict) and res.get("rc", 0) != 0
+    }
+    return json.dumps(failing or report, separators=(",", ":"))
+
+class _FenceStream:
+    """
+    Incremental counterpart of AIBackend._extract_code: fed raw response deltas,
+    it forwards only the body of the first fenced block to sink as it arrives.
+    """
+    _CLOSE = "\n```"
+
+    def __init__(self, sink: Callable[[str], None]):
+        self.sink = sink
+        self.buf = ""
+        self.state = 0  # 0: before the opening fence, 1: inside the block, 2: done
+
+    def feed(self, delta: str) -> None:
+        if self.state == 2:
+            return
+        self.buf += delta
+        if self.state == 0:
+            m = _FENCE_OPEN_RE.search(self.buf)
+            if not m:
+                return
+            self.buf = self.buf[m.end():]
+            self.state = 1
+        end = self.buf.find(self._CLOSE)
+        if end >= 0:
+            # the newline before the closing fence ends the last line of code
+            self.sink(self.buf[:end] + "\n")
+            self.buf = ""
+            self.state = 2
+            return
+        # hold back a tail that could be the start of the closing fence
+        keep = len(self._CLOSE) - 1
+        if len(self.buf) > keep:
+            self.sink(self.buf[:-keep])
+            self.buf = self.buf[-keep:]
+
 class AIBackend:
-    def __init__(self, provider: Optional[str] = None, max_retry: int = 2, model: str = "gpt-4o-mini"):
+    def __init__(self, provider: Optional[str] = None, max_retry: int = 2, model: str = "gpt-4o-mini",
+                 use_cache: bool = True, cache_dir: Optional[Path] = None, cache_ttl: Optional[float] = CACHE_TTL):
         """
         provider: 'openai' or None (auto)
         model: default model name (change as desired)
+        use_cache: answer repeated identical requests from the local response cache
+        cache_dir / cache_ttl: cache location and entry lifetime in seconds (None = no expiry)
         """
         self.provider = provider or ("openai" if OPENAI_PKG and OPENAI_API_KEY else "local")
         self.max_retry = max_retry
         self.model = model
-        if self.provider == "openai" and OPENAI_PKG:
-            openai.api_key = OPENAI_API_KEY
+        self.use_cache = use_cache
+        self.cache_dir = Path(cache_dir) if cache_dir else CACHE_DIR
+        self.cache_ttl = cache_ttl
+        self._aclient = None  # created on first use, see _client
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _client(self):
+        """
+        The AsyncOpenAI client, created on first request so that constructing a
+        backend never fails; a missing key surfaces as a failed request instead.
+        """
+        if self._aclient is None:
+            if not OPENAI_API_KEY:
+                raise RuntimeError("OPENAI_API_KEY is not set")
+            # one pooled client for the backend's lifetime: retries and repair
+            # iterations reuse the open TLS connection instead of redoing the
+            # handshake (httpx's default keep-alive of 5 s is shorter than an
+            # analysis pass)
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=60),
+                timeout=httpx.Timeout(600.0, connect=5.0),
+                http2=HTTP2,
+            )
+            # with tenacity, retries are done by _call_openai and the SDK's own
+            # would stack on top; without it, leave them to the SDK
+            sdk_retries = 0 if TENACITY_PKG else max(self.max_retry, 0)
+            self._aclient = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client, max_retries=sdk_retries)
+        return self._aclient
+
+    async def aclose(self) -> None:
+        """
+        Close the pooled HTTP client. Call it on the event loop the backend was
+        used on; a later request opens a new client.
+        """
+        client, self._aclient = self._aclient, None
+        if client is not None:
+            await client.close()
+
+    def close(self) -> None:
+        """Sync counterpart of aclose; also closes the event loop owned by run()."""
+        if self._aclient is not None:
+            self.run(self.aclose())
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.close()
+
+    def run(self, coro):
+        """
+        Drive a coroutine from sync code. The loop is owned by the backend and
+        reused, so pooled connections of the async client stay on one loop.
+        Don't mix with use of the same backend from another event loop.
+        """
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
 
-    def generate_code(self, prompt: str, language: str = "python", instructions: Optional[str] = None, max_tokens: int = 2000) -> Dict:
+    def generate_code(self, prompt: str, language: str = "python", instructions: Optional[str] = None, max_tokens: int = 2000,
+                      on_code: Optional[Callable[[str], None]] = None) -> Dict:
+        """Sync wrapper around agenerate_code."""
+        return self.run(self.agenerate_code(prompt, language=language, instructions=instructions, max_tokens=max_tokens, on_code=on_code))
+
+    def repair_code(self, code: str, analysis_report: Dict, language: str = "python", max_tokens: int = 1500,
+                    on_code: Optional[Callable[[str], None]] = None) -> Dict:
+        """Sync wrapper around arepair_code."""
+        return self.run(self.arepair_code(code, analysis_report, language=language, max_tokens=max_tokens, on_code=on_code))
+
+    def repair_code_variants(self, code: str, analysis_report: Dict, n: int = 3, language: str = "python", max_tokens: int = 1500) -> Dict:
+        """Sync wrapper around arepair_code_variants."""
+        return self.run(self.arepair_code_variants(code, analysis_report, n=n, language=language, max_tokens=max_tokens))
+
+    def repair_code_batch(self, codes: List[str], reports: List[Dict], language: str = "python", max_tokens: int = 4000) -> List[Dict]:
+        """Sync wrapper around arepair_code_batch."""
+        return self.run(self.arepair_code_batch(codes, reports, language=language, max_tokens=max_tokens))
+
+    def submit_batch(self, prompts: List[str], languages: Optional[List[str]] = None, max_tokens: int = 2000) -> str:
+        """Sync wrapper around asubmit_batch."""
+        return self.run(self.asubmit_batch(prompts, languages=languages, max_tokens=max_tokens))
+
+    def poll_batch(self, batch_id: str, count: Optional[int] = None) -> Optional[List[Dict]]:
+        """Sync wrapper around apoll_batch."""
+        return self.run(self.apoll_batch(batch_id, count=count))
+
+    async def agenerate_many(self, prompts: List[str], language: str = "python", max_tokens: int = 2000) -> List[Dict]:
+        """
+        Generate code for several prompts concurrently; total latency is roughly
+        that of the slowest request instead of the sum.
+        """
+        return await asyncio.gather(*(self.agenerate_code(p, language=language, max_tokens=max_tokens) for p in prompts))
+
+    async def agenerate_code(self, prompt: str, language: str = "python", instructions: Optional[str] = None, max_tokens: int = 2000,
+                             on_code: Optional[Callable[[str], None]] = None) -> Dict:
         """
         Ask the LLM to generate an implementation for the prompt.
         Returns dict with keys: { 'success': bool, 'code': str, 'meta': {...} }
+
+        on_code: if given, the response is streamed and the code is passed to it
+        chunk by chunk as it arrives. The result then also has 'streamed': True
+        when the chunks add up to exactly 'code' (otherwise, e.g. after a retry,
+        the caller should replace what it received with 'code').
         """
-        system_msg = (
-            "You are an assistant that writes correct, well-documented, and testable code."
-            " If asked for JavaScript produce idiomatic Node.js-compatible JS (CommonJS or ESM as requested)."
-            " If asked for Python produce Python 3.8+ code with functions/classes and minimal external deps."
-            " Always return only the code block in triple backticks if possible, and include a short JSON metadata block if requested."
-        )
-        user_msg = f"{prompt}\n\nTarget language: {language}\nRequirements: produce a full, runnable implementation, and include comments and example usage."
+        emitted: List[str] = []
+
+        def forward(chunk: str) -> None:
+            emitted.append(chunk)
+            if on_code is not None:
+                on_code(chunk)
+
+        user_msg = self._generate_message(prompt, language, instructions)
 
         if self.provider == "openai" and OPENAI_PKG:
             try:
-                for attempt in range(self.max_retry + 1):
-                    resp = openai.ChatCompletion.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": system_msg},
-                            {"role": "user", "content": user_msg},
-                        ],
-                        max_tokens=max_tokens,
-                        temperature=0.2,
-                    )
-                    text = resp["choices"][0]["message"]["content"].strip()
+                attempts = max(self.max_retry, 0) + 1
+                for attempt in range(attempts):
+                    on_delta = _FenceStream(forward).feed if on_code else None
+                    # a retry must reach the model, not replay the cached answer
+                    text = (await self._achat(user_msg, max_tokens=max_tokens, temperature=0.2, read_cache=attempt == 0, on_delta=on_delta))[0]
                     code = self._extract_code(text)
-                    if code:
-                        return {"success": True, "code": code, "raw": text, "meta": {"provider": "openai", "model": self.model}}
+                    if code and code.strip():
+                        return {"success": True, "code": code, "raw": text, "streamed": "".join(emitted) == code, "meta": {"provider": "openai", "model": self.model}}
                     # fallback: return raw text if no triple-backtick code
-                    if attempt < self.max_retry:
-                        time.sleep(1 + attempt * 1)
+                    if attempt < attempts - 1:
                         continue
-                    return {"success": True, "code": text, "raw": text, "meta": {"provider": "openai", "model": self.model}}
+                    code = _one_newline(text)
+                    return {"success": True, "code": code, "raw": text, "streamed": "".join(emitted) == code, "meta": {"provider": "openai", "model": self.model}}
             except Exception as e:
                 return {"success": False, "error": str(e)}
+            return {"success": False, "error": "no response from the model"}
         else:
             # Local / stub behaviour: generate simple templates
             template = ""
@@ -99,50 +428,284 @@ def tambah(a, b):
 if __name__ == "__main__":
     print("2 + 3 =", tambah(2, 3))
 '''
-            return {"success": True, "code": template, "meta": {"provider": "local", "model": "stub"}}
+            if on_code:
+                forward(template)
+            return {"success": True, "code": template, "streamed": bool(on_code), "meta": {"provider": "local", "model": "stub"}}
 
-    def repair_code(self, code: str, analysis_report: Dict, language: str = "python", max_tokens: int = 1500) -> Dict:
+    async def arepair_code(self, code: str, analysis_report: Dict, language: str = "python", max_tokens: int = 1500,
+                           on_code: Optional[Callable[[str], None]] = None) -> Dict:
         """
         Provide the LLM with code and analysis report, ask it to repair/fix.
-        Returns same structure as generate_code.
+        Returns same structure as generate_code; on_code streams the repaired
+        code as in generate_code.
         """
+        emitted: List[str] = []
+
+        def forward(chunk: str) -> None:
+            emitted.append(chunk)
+            if on_code is not None:
+                on_code(chunk)
+
         if self.provider == "openai" and OPENAI_PKG:
-            system_msg = "You are a code repair assistant. Read the code and the analysis report and return a corrected, runnable version."
-            user_msg = (
-                "Code:\n```\n" + code + "\n```\n\n"
-                "Analysis report (lint/errors):\n" + json.dumps(analysis_report, indent=2) + "\n\n"
-                "Please return only the repaired code inside triple backticks, and nothing else."
-            )
+            user_msg = self._repair_message(code, analysis_report)
+            on_delta = _FenceStream(forward).feed if on_code else None
             try:
-                resp = openai.ChatCompletion.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_msg},
-                        {"role": "user", "content": user_msg},
-                    ],
-                    max_tokens=max_tokens,
-                    temperature=0.0,
-                )
-                text = resp["choices"][0]["message"]["content"].strip()
-                code_out = self._extract_code(text) or text
-                return {"success": True, "code": code_out, "raw": text, "meta": {"provider": "openai", "model": self.model}}
+                text = (await self._achat(user_msg, max_tokens=max_tokens, temperature=0.0, on_delta=on_delta))[0]
+                code_out = self._extract_code(text) or _one_newline(text)
+                return {"success": True, "code": code_out, "raw": text, "streamed": "".join(emitted) == code_out, "meta": {"provider": "openai", "model": self.model}}
             except Exception as e:
                 return {"success": False, "error": str(e)}
         else:
             # Local fallback: no changes
-            return {"success": True, "code": code, "meta": {"provider": "local", "note": "no-op repair"}}
+            if on_code:
+                forward(code)
+            return {"success": True, "code": code, "streamed": bool(on_code), "meta": {"provider": "local", "note": "no-op repair"}}
+
+    async def arepair_code_variants(self, code: str, analysis_report: Dict, n: int = 3, language: str = "python", max_tokens: int = 1500) -> Dict:
+        """
+        Ask for n alternative repairs of the same code in a single request (n=k
+        choices), so the caller can try them in turn without k round-trips.
+        Returns generate_code's structure plus 'candidates': list of code strings.
+        """
+        if self.provider == "openai" and OPENAI_PKG:
+            user_msg = self._repair_message(code, analysis_report)
+            try:
+                # identical choices at temperature 0 would defeat the purpose
+                texts = await self._achat(user_msg, max_tokens=max_tokens, temperature=0.0 if n == 1 else 0.7, n=n)
+                candidates = [self._extract_code(t) or _one_newline(t) for t in texts]
+                return {"success": True, "code": candidates[0], "candidates": candidates, "raw": texts[0], "meta": {"provider": "openai", "model": self.model, "n": n}}
+            except Exception as e:
+                return {"success": False, "error": str(e)}
+        else:
+            return {"success": True, "code": code, "candidates": [code], "meta": {"provider": "local", "note": "no-op repair"}}
+
+    async def arepair_code_batch(self, codes: List[str], reports: List[Dict], language: str = "python", max_tokens: int = 4000) -> List[Dict]:
+        """
+        Repair several files in one request. Each file and its report is sent as a
+        tagged <<FILE i>>...<<END i>> section and the answer is split back apart.
+        Returns one generate_code-style dict per input, in order.
+        """
+        if len(codes) != len(reports):
+            raise ValueError("codes and reports must have the same length")
+        if self.provider != "openai" or not OPENAI_PKG:
+            return [{"success": True, "code": c, "meta": {"provider": "local", "note": "no-op repair"}} for c in codes]
+
+        sections = []
+        for i, (code, report) in enumerate(zip(codes, reports)):
+            sections.append(
+                f"<<FILE {i}>>\nCode:\n```\n{code}\n```\n\n"
+                f"Analysis report (lint/errors):\n{_report_json(report)}\n<<END {i}>>"
+            )
+        user_msg = _REPAIR_BATCH_HEAD + "\n\n".join(sections)
+        try:
+            text = (await self._achat(user_msg, max_tokens=max_tokens, temperature=0.0))[0]
+        except Exception as e:
+            return [{"success": False, "error": str(e)} for _ in codes]
+
+        found = {int(m.group(1)): m.group(2) for m in _FILE_SECTION_RE.finditer(text)}
+        results = []
+        for i in range(len(codes)):
+            if i not in found:
+                results.append({"success": False, "error": f"no <<FILE {i}>> section in response", "raw": text})
+                continue
+            section = found[i].strip()
+            code_out = self._extract_code(section) or _one_newline(section)
+            results.append({"success": True, "code": code_out, "raw": section, "meta": {"provider": "openai", "model": self.model}})
+        return results
+
+    async def asubmit_batch(self, prompts: List[str], languages: Optional[List[str]] = None, max_tokens: int = 2000) -> str:
+        """
+        Submit generation requests for all prompts to the OpenAI Batch API
+        (half the price of synchronous calls, separate rate-limit pool, results
+        within 24 h). Returns the batch id; fetch results with poll_batch.
+        """
+        if self.provider != "openai" or not OPENAI_PKG:
+            raise RuntimeError("batch mode requires the OpenAI provider (set OPENAI_API_KEY)")
+        languages = languages or ["python"] * len(prompts)
+        if len(languages) != len(prompts):
+            raise ValueError("prompts and languages must have the same length")
+        lines = []
+        for i, (prompt, language) in enumerate(zip(prompts, languages)):
+            body = {
+                "model": self.model,
+                "messages": self._messages(self._generate_message(prompt, language)),
+                "max_tokens": max_tokens,
+                "temperature": 0.2,
+            }
+            lines.append(json.dumps({"custom_id": f"prompt-{i}", "method": "POST", "url": "/v1/chat/completions", "body": body}))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        batch_file = await self._client().files.create(file=("arifi_batch.jsonl", data), purpose="batch")
+        batch = await self._client().batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def apoll_batch(self, batch_id: str, count: Optional[int] = None) -> Optional[List[Dict]]:
+        """
+        Check a batch submitted with submit_batch. Returns None while it is still
+        running, otherwise one generate_code-style dict per prompt, in order.
+        count is the number of prompts submitted (default: the batch's request
+        count). Raises RuntimeError if the batch failed, expired or was cancelled.
+        """
+        if self.provider != "openai" or not OPENAI_PKG:
+            raise RuntimeError("batch mode requires the OpenAI provider (set OPENAI_API_KEY)")
+        batch = await self._client().batches.retrieve(batch_id)
+        if batch.status in ("failed", "expired", "cancelled", "cancelling"):
+            raise RuntimeError(f"batch {batch_id} {batch.status}")
+        if batch.status != "completed":
+            return None
+
+        if count is None:
+            count = batch.request_counts.total if batch.request_counts else 0
+        results: List[Dict] = [{"success": False, "error": "no result in batch output"} for _ in range(count)]
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self._client().files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                try:
+                    idx = int(item["custom_id"].rsplit("-", 1)[1])
+                except (KeyError, IndexError, ValueError):
+                    continue
+                if not 0 <= idx < count:
+                    continue
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    results[idx] = {"success": False, "error": str(item.get("error") or response.get("body"))}
+                    continue
+                text = (response["body"]["choices"][0]["message"]["content"] or "").strip()
+                code = self._extract_code(text) or _one_newline(text)
+                results[idx] = {"success": True, "code": code, "raw": text, "meta": {"provider": "openai", "model": self.model, "batch": batch_id}}
+        return results
+
+    async def _achat(self, user_msg: str, max_tokens: int, temperature: float, n: int = 1, read_cache: bool = True,
+                     on_delta: Optional[Callable[[str], None]] = None) -> List[str]:
+        """
+        Send _SYSTEM_PREFIX + user_msg to the chat completions API and return the
+        stripped text of every choice. Answers are stored in the local cache;
+        read_cache=False skips the lookup but still refreshes the entry.
+        on_delta (n=1 only): stream the response and pass each text delta to it;
+        a cache hit is passed on as a single delta.
+        """
+        messages = self._messages(user_msg)
+        key = self._cache_key(messages, max_tokens=max_tokens, temperature=temperature, n=n)
+        if read_cache:
+            cached = self._cache_get(key)
+            if cached is not None:
+                if on_delta:
+                    on_delta(cached[0])
+                return cached
+        if on_delta and n == 1:
+            stream = await self._call_openai(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+            )
+            parts = []
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    on_delta(delta)
+            texts = ["".join(parts).strip()]
+        else:
+            resp = await self._call_openai(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                n=n,
+            )
+            texts = [(c.message.content or "").strip() for c in resp.choices]
+        self._cache_put(key, texts)
+        return texts
+
+    async def _call_openai(self, **kwargs):
+        """
+        chat.completions.create with retries on rate limits and transient
+        connection/server errors: capped exponential backoff with jitter, or the
+        server's Retry-After when it sends one. Other errors propagate at once.
+        """
+        if not TENACITY_PKG:
+            return await self._client().chat.completions.create(**kwargs)
+        async for attempt in AsyncRetrying(
+            wait=_wait_retry_after,
+            stop=stop_after_attempt(self.max_retry + 1),
+            retry=retry_if_exception_type((openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)),
+            reraise=True,
+        ):
+            with attempt:
+                return await self._client().chat.completions.create(**kwargs)
+
+    def _cache_key(self, messages: List[Dict], **params) -> str:
+        payload = json.dumps({"model": self.model, "messages": messages, "params": params}, sort_keys=True, separators=(",", ":"))
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[List[str]]:
+        if not self.use_cache:
+            return None
+        path = self.cache_dir / f"{key}.json"
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if self.cache_ttl is not None and time.time() - entry.get("created", 0) > self.cache_ttl:
+            return None
+        return entry.get("texts")
+
+    def _cache_put(self, key: str, texts: List[str]) -> None:
+        if not self.use_cache:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # write-then-rename so concurrent readers never see a partial entry
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump({"created": time.time(), "model": self.model, "texts": texts}, fh)
+            os.replace(tmp, self.cache_dir / f"{key}.json")
+        except OSError:
+            pass
+
+    @staticmethod
+    def _messages(user_msg: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": _SYSTEM_PREFIX},
+            {"role": "user", "content": user_msg},
+        ]
+
+    @staticmethod
+    def _generate_message(prompt: str, language: str, instructions: Optional[str] = None) -> str:
+        user_msg = _GENERATE_HEAD
+        if instructions:
+            user_msg += f"Additional instructions: {instructions}\n\n"
+        return user_msg + f"Target language: {language}\n\nTask:\n{prompt}"
+
+    @staticmethod
+    def _repair_message(code: str, analysis_report: Dict) -> str:
+        return (
+            _REPAIR_HEAD
+            + "Code:\n```\n" + code + "\n```\n\n"
+            + "Analysis report (lint/errors):\n" + _report_json(analysis_report)
+        )
 
     @staticmethod
     def _extract_code(text: str) -> Optional[str]:
         """
-        If the model returns fenced code, extract it. Otherwise return None.
-        """
-        import re
-        m = re.search(r"```(?:\w+)?\\n([\\s\\S]*?)\\n```", text)
-        if m:
-            return m.group(1)
-        # try triple backtick without language
-        m2 = re.search(r"```\\n([\\s\\S]*?)\\n```", text)
-        if m2:
-            return m2.group(1)
-        return None
\ No newline at end of file
+        If the model returns fenced code, extract it (ending in exactly one
+        newline). Otherwise return None.
+        """
+        m = _CODE_FENCE_RE.search(text)
+        return _one_newline(m.group(1)) if m else None
+
+
+if __debug__:
+    assert AIBackend._extract_code("x\n```python\nprint(1)\n```\n") == "print(1)\n"
+    assert AIBackend._extract_code("```\na = 1\n```") == "a = 1\n"
+    assert AIBackend._extract_code("no code here") is None
@@ -9,30 +9,66 @@ Features:
 - performs feedback loop: repair via AI until analysis passes or max iterations reached
 """
 
+import os
+import re
 import sys
+import atexit
+import glob
 import json
+import asyncio
+import hashlib
+import argparse
+import importlib
+import tempfile
+import threading
 import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from .ai_backend import AIBackend
 
-BASE_DIR = Path(__file__).parent.parent.resolve()
-OUTPUT_DIR = Path(BASE_DIR) / "output"
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+# Optional: orjson serializes reports and meta files much faster than json
+try:
+    import orjson  # type: ignore
+    ORJSON_PKG = True
+except Exception:
+    ORJSON_PKG = False
+
+# resolved (and created) on first use rather than at import, so importing the
+# package or running --help touches no disk and works on read-only installs
+@lru_cache(maxsize=None)
+def _base_dir() -> Path:
+    return Path(__file__).parent.parent.resolve()
+
+@lru_cache(maxsize=None)
+def _output_dir() -> Path:
+    d = _base_dir() / "output"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
 
 # configurable
 MAX_EVOLVE_ITER = 3  # max repair iterations with AI
+REPAIR_CANDIDATES = 1  # >1: request that many repair variants in one AI call per iteration
+MAX_CONCURRENT_PROMPTS = 10  # prompts processed at once in directory/glob mode
+USE_DMYPY = True  # type-check through a mypy daemon kept alive for the whole run
+DMYPY_TIMEOUT = 300  # seconds idle before the daemon exits on its own, so a killed runner leaves none behind
 AI_MODEL = "gpt-4o-mini"  # change if desired
 
+# language hints in a prompt; whole words only, so "json" or "results" don't count
+_LANG_RE = re.compile(r"javascript|typescript|nodejs|\b(?:js|ts)\b", re.IGNORECASE)
+
 def detect_language_from_prompt(prompt: str) -> str:
-    lower = prompt.lower()
-    if "javascript" in lower or "js" in lower or ".js" in lower:
-        return "javascript"
-    if "typescript" in lower or "ts " in lower:
-        return "typescript"
-    return "python"
+    # single case-insensitive scan; a JavaScript hint wins over a TypeScript one
+    lang = "python"
+    for m in _LANG_RE.finditer(prompt):
+        if not m.group(0).lower().startswith("t"):
+            return "javascript"
+        lang = "typescript"
+    return lang
 
 def run_cmd(cmd: list, timeout: int = 20) -> Dict:
     try:
@@ -41,23 +77,293 @@ def run_cmd(cmd: list, timeout: int = 20) -> Dict:
     except Exception as e:
         return {"rc": 2, "stdout": "", "stderr": str(e)}
 
-def analyze_file(path: Path) -> Dict:
-    """Run language-appropriate analysis. Returns report dict."""
-    lang = path.suffix.lstrip(".")
-    report = {}
-    if lang == "py":
-        # flake8
-        report["flake8"] = run_cmd(["flake8", str(path)])
-        # mypy
-        report["mypy"] = run_cmd(["mypy", str(path)])
-        # radon
-        report["radon"] = run_cmd(["radon", "cc", "-s", str(path)])
-    elif lang in ("js", "ts"):
-        # placeholder for eslint/prettier; try to run eslint if present
-        report["eslint"] = run_cmd(["eslint", str(path)])
-    else:
-        report["note"] = f"no analyzer for .{lang}"
-    return report
+async def arun_cmd(cmd: list, timeout: int = 20) -> Dict:
+    """run_cmd without tying up a thread while the tool runs."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except Exception as e:
+        return {"rc": 2, "stdout": "", "stderr": str(e)}
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return {"rc": 2, "stdout": "", "stderr": f"Command {cmd!r} timed out after {timeout} seconds"}
+    return {
+        "rc": proc.returncode,
+        "stdout": stdout.decode("utf-8", "replace").strip(),
+        "stderr": stderr.decode("utf-8", "replace").strip(),
+    }
+
+@lru_cache(maxsize=None)
+def _import_tool(module: str):
+    """Import an analyzer's Python API once per process; None if not installed."""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        return None
+
+# mypy keeps process-global state and every daemon check replaces the daemon's
+# file set, so type checks are serialized; the lock also guards daemon start-up
+_MYPY_LOCK = threading.Lock()
+
+def _flake8_report(path: Path) -> Dict:
+    app_mod = _import_tool("flake8.main.application")
+    if app_mod is None:
+        return run_cmd(["flake8", str(path)])
+    # flake8 writes straight to sys.stdout.buffer, so let it report to a file
+    fd, out_file = tempfile.mkstemp(suffix=".flake8")
+    os.close(fd)
+    try:
+        app = app_mod.Application()
+        app.run([str(path), "--output-file", out_file])
+        stdout = Path(out_file).read_text(encoding="utf-8").strip()
+        return {"rc": app.exit_code(), "stdout": stdout, "stderr": ""}
+    except (Exception, SystemExit) as e:
+        return {"rc": 2, "stdout": "", "stderr": str(e)}
+    finally:
+        os.unlink(out_file)
+
+_dmypy_ok: Optional[bool] = None  # None: not started yet
+
+@lru_cache(maxsize=None)
+def _dmypy_status() -> str:
+    # per-process status file, so we never talk to (or stop) somebody else's
+    # daemon; resolved on first use since gettempdir() probes the disk
+    return os.path.join(tempfile.gettempdir(), f"arifi-dmypy-{os.getpid()}.json")
+
+def _dmypy(*args: str, timeout: int = 120) -> Dict:
+    return run_cmd(["dmypy", "--status-file", _dmypy_status(), *args], timeout=timeout)
+
+def _dmypy_available() -> bool:
+    """Start the mypy daemon on first use; False if it cannot be started."""
+    global _dmypy_ok
+    if _dmypy_ok is None:
+        _dmypy_ok = _dmypy("start", "--timeout", str(DMYPY_TIMEOUT))["rc"] == 0
+        if _dmypy_ok:
+            # once, also when the daemon had to be restarted
+            atexit.unregister(_dmypy)
+            atexit.register(_dmypy, "stop")
+    return _dmypy_ok
+
+def _use_dmypy(path: Path) -> bool:
+    if not (USE_DMYPY and _parses(path)):
+        return False
+    with _MYPY_LOCK:
+        return _dmypy_available()
+
+def _mypy_report(path: Path) -> Dict:
+    # with the daemon only the first check pays for loading stubs; later checks
+    # in the repair loop are incremental
+    global _dmypy_ok
+    if _use_dmypy(path):
+        with _MYPY_LOCK:
+            result = _dmypy("check", str(path))
+            if result["rc"] != 2:
+                return result
+            # 2 means the check did not run (e.g. the daemon exited after
+            # DMYPY_TIMEOUT idle): never report that as a type error; answer
+            # in-process, and start a new daemon next time if this one is gone
+            if _dmypy("status")["rc"] != 0:
+                _dmypy_ok = None
+    api = _import_tool("mypy.api")
+    if api is None:
+        return run_cmd(["mypy", str(path)])
+    try:
+        with _MYPY_LOCK:
+            stdout, stderr, rc = api.run([str(path)])
+        return {"rc": rc, "stdout": stdout.strip(), "stderr": stderr.strip()}
+    except Exception as e:
+        return {"rc": 2, "stdout": "", "stderr": str(e)}
+
+def _parses(path: Path) -> bool:
+    # dmypy can report "Success" for a file with a syntax error after an earlier
+    # clean check, so such files go to plain mypy, which fails fast on them
+    try:
+        compile(path.read_bytes(), str(path), "exec", dont_inherit=True)
+        return True
+    except (SyntaxError, ValueError, OSError):
+        return False
+
+def _radon_report(path: Path) -> Dict:
+    complexity = _import_tool("radon.complexity")
+    if complexity is None:
+        return run_cmd(["radon", "cc", "-s", str(path)])
+    # same text as `radon cc -s <path>`
+    lines = [str(path)]
+    try:
+        blocks = complexity.sorted_results(complexity.cc_visit(path.read_text(encoding="utf-8")))
+        for b in blocks:
+            lines.append(f"    {b.letter} {b.lineno}:{b.col_offset} {b.fullname} - {complexity.cc_rank(b.complexity)} ({b.complexity})")
+    except Exception as e:
+        lines.append(f"    ERROR: {e}")
+    return {"rc": 0, "stdout": "\n".join(lines), "stderr": ""}
+
+def _eslint_report(path: Path) -> Dict:
+    # placeholder for eslint/prettier; try to run eslint if present
+    return run_cmd(["eslint", str(path)])
+
+async def _aeslint_report(path: Path) -> Dict:
+    return await arun_cmd(["eslint", str(path)])
+
+_ANALYZERS = {
+    "flake8": _flake8_report,
+    "mypy": _mypy_report,
+    "radon": _radon_report,
+    "eslint": _eslint_report,
+}
+# analyzers that shell out; the rest run on the default executor, mypy there
+# too since its checks (daemon or in-process) hold _MYPY_LOCK, which must be
+# taken and released on the same executor call
+_AANALYZERS = {
+    "eslint": _aeslint_report,
+}
+# per file type, cheapest / most decisive first
+_ANALYZERS_BY_EXT = {
+    "py": ("flake8", "mypy", "radon"),
+    "js": ("eslint",),
+    "ts": ("eslint",),
+}
+# the analyzers metrics_ok decides on
+_GATING = ("flake8", "mypy", "eslint")
+
+def _digest(path: Path, code: Optional[str]) -> Optional[str]:
+    try:
+        data = code.encode("utf-8") if code is not None else path.read_bytes()
+    except OSError:
+        return None
+    return hashlib.sha1(data).hexdigest()
+
+# (analyzer, path, content digest) -> result, shared by the sync and async paths
+_MEMO: "OrderedDict[Tuple[str, str, str], Dict]" = OrderedDict()
+_MEMO_SIZE = 128
+_MEMO_LOCK = threading.Lock()
+
+def _memo_get(key: Tuple[str, str, str]) -> Optional[Dict]:
+    with _MEMO_LOCK:
+        result = _MEMO.get(key)
+        if result is None:
+            return None
+        _MEMO.move_to_end(key)
+        return dict(result)
+
+def _memo_put(key: Tuple[str, str, str], result: Dict) -> None:
+    with _MEMO_LOCK:
+        _MEMO[key] = dict(result)
+        _MEMO.move_to_end(key)
+        if len(_MEMO) > _MEMO_SIZE:
+            _MEMO.popitem(last=False)
+
+def _run_analyzer(name: str, path: Path, digest: Optional[str]) -> Dict:
+    if digest is None:
+        return _ANALYZERS[name](path)
+    key = (name, str(path), digest)
+    result = _memo_get(key)
+    if result is None:
+        result = _ANALYZERS[name](path)
+        _memo_put(key, result)
+    return result
+
+async def _arun_analyzer(name: str, path: Path, digest: Optional[str]) -> Dict:
+    key = (name, str(path), digest) if digest is not None else None
+    result = _memo_get(key) if key is not None else None
+    if result is None:
+        afn = _AANALYZERS.get(name)
+        result = await afn(path) if afn is not None else await _to_thread(_ANALYZERS[name], path)
+        if key is not None:
+            _memo_put(key, result)
+    return result
+
+def iter_analyzers(path: Path, code: Optional[str] = None, gating_only: bool = False) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (name, result) for the file's analyzers one at a time, in order of
+    cost, so a caller can stop at the first failure without running the rest.
+    gating_only skips analyzers that metrics_ok ignores (radon).
+    """
+    ext = path.suffix.lstrip(".")
+    names = _ANALYZERS_BY_EXT.get(ext)
+    if names is None:
+        yield "note", f"no analyzer for .{ext}"
+        return
+    digest = _digest(path, code)
+    for name in names:
+        if gating_only and name not in _GATING:
+            continue
+        yield name, _run_analyzer(name, path, digest)
+
+def analyze_file(path: Path, code: Optional[str] = None) -> Dict:
+    """
+    Run language-appropriate analysis. Returns report dict.
+    Python analyzers run in-process through their APIs (falling back to the
+    CLI when a tool is not importable); independent analyzers run concurrently.
+    Results are memoized per analyzer on (path, content hash), so re-analyzing
+    an unchanged file is free. Pass code (the text already written to path) to
+    hash it from memory instead of reading the file back.
+    """
+    ext = path.suffix.lstrip(".")
+    names = _ANALYZERS_BY_EXT.get(ext)
+    if names is None:
+        return dict(iter_analyzers(path, code))
+    digest = _digest(path, code)
+    with ThreadPoolExecutor(max_workers=len(names)) as ex:
+        futures = {name: ex.submit(_run_analyzer, name, path, digest) for name in names}
+        return {name: f.result() for name, f in futures.items()}
+
+def check_file(path: Path, code: Optional[str] = None) -> Tuple[bool, Dict]:
+    """
+    metrics_ok(analyze_file(path)) without the wasted work: gating analyzers
+    run one by one and stop at the first failure. Returns (ok, report so far),
+    the report holding the failing analyzer's output for the repair request.
+    """
+    report: Dict = {}
+    for name, result in iter_analyzers(path, code, gating_only=True):
+        report[name] = result
+        if not metrics_ok(report):
+            return False, report
+    return True, report
+
+async def aanalyze_file(path: Path, code: Optional[str] = None) -> Dict:
+    """
+    analyze_file for the event loop: the analyzers run concurrently, eslint
+    as an asyncio subprocess, the others on the default executor. Shares
+    analyze_file's memo.
+    """
+    ext = path.suffix.lstrip(".")
+    names = _ANALYZERS_BY_EXT.get(ext)
+    if names is None:
+        return dict(iter_analyzers(path, code))
+    digest = _digest(path, code)
+    results = await asyncio.gather(*(_arun_analyzer(name, path, digest) for name in names))
+    return dict(zip(names, results))
+
+async def acheck_file(path: Path, code: Optional[str] = None) -> Tuple[bool, Dict]:
+    """check_file for the event loop."""
+    ext = path.suffix.lstrip(".")
+    names = _ANALYZERS_BY_EXT.get(ext)
+    if names is None:
+        return True, dict(iter_analyzers(path, code))
+    digest = _digest(path, code)
+    report: Dict = {}
+    for name in names:
+        if name not in _GATING:
+            continue
+        report[name] = await _arun_analyzer(name, path, digest)
+        if not metrics_ok(report):
+            return False, report
+    return True, report
+
+def _portable_report(report: Dict, path: Path) -> Dict:
+    """
+    report with every mention of the artifact's path (timestamped and local to
+    this machine) replaced by <file>, so a repair request for the same code and
+    findings is identical across runs and can be answered from the cache.
+    """
+    path_re = re.compile(r"[^\s:'\"]*" + re.escape(path.name))
+    return {
+        name: {k: path_re.sub("<file>", v) if isinstance(v, str) else v for k, v in res.items()} if isinstance(res, dict) else res
+        for name, res in report.items()
+    }
 
 def metrics_ok(report: Dict) -> bool:
     """
@@ -65,96 +371,312 @@ def metrics_ok(report: Dict) -> bool:
     For Python: flake8 rc==0 and mypy rc==0
     For JS: eslint rc==0 if present
     """
-    if "flake8" in report and report["flake8"]["rc"] != 0:
-        return False
-    if "mypy" in report and report["mypy"]["rc"] != 0:
-        return False
-    if "eslint" in report and report["eslint"]["rc"] != 0:
-        return False
+    for name in _GATING:
+        result = report.get(name)
+        if result is not None and result["rc"] != 0:
+            return False
     # else assume ok
     return True
 
-def save_artifacts(code: str, prompt: str, lang: str) -> Path:
+def _json_bytes(obj: Any, indent: bool = False) -> bytes:
+    """UTF-8 JSON for meta files and reports; orjson when installed, else json."""
+    if ORJSON_PKG:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
+
+def _new_artifact(lang: str, tag: str = "") -> Tuple[Path, str]:
     ts = datetime.now().strftime("%Y%m%d-%H%M%S")
     ext = "py" if lang == "python" else ("js" if lang == "javascript" else "txt")
-    out = OUTPUT_DIR / f"generated_{ts}.{ext}"
-    out.write_text(code, encoding="utf-8")
+    # tag keeps artifacts of prompts generated in the same second apart
+    name = f"generated_{ts}_{tag}" if tag else f"generated_{ts}"
+    return _output_dir() / f"{name}.{ext}", ts
+
+def _write_meta(out: Path, prompt: str, lang: str, ts: str) -> None:
     meta = {"prompt": prompt, "language": lang, "generated_at": ts}
-    (out.with_suffix(out.suffix + ".meta.json")).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    (out.with_suffix(out.suffix + ".meta.json")).write_bytes(_json_bytes(meta, indent=True))
+
+def save_artifacts(code: str, prompt: str, lang: str, tag: str = "") -> Path:
+    out, ts = _new_artifact(lang, tag)
+    out.write_text(code, encoding="utf-8")
+    _write_meta(out, prompt, lang, ts)
     return out
 
+async def _to_thread(fn, *args):
+    # asyncio.to_thread needs Python 3.9
+    return await asyncio.get_running_loop().run_in_executor(None, partial(fn, *args))
+
+def _file_sink(fh) -> Callable[[str], None]:
+    """on_code callback writing each chunk through to an open file."""
+    def sink(chunk: str) -> None:
+        fh.write(chunk)
+        fh.flush()
+    return sink
+
+def stream_artifacts(prompt: str, backend: AIBackend, lang: str, tag: str = "") -> Tuple[Dict, Optional[Path]]:
+    """Sync wrapper around astream_artifacts."""
+    return backend.run(astream_artifacts(prompt, backend, lang, tag=tag))
+
+async def astream_artifacts(prompt: str, backend: AIBackend, lang: str, tag: str = "") -> Tuple[Dict, Optional[Path]]:
+    """
+    Generate code and write it to the artifact file while the response streams
+    in, instead of waiting for the whole answer. Returns (generation result,
+    artifact path or None if generation failed).
+    """
+    out, ts = _new_artifact(lang, tag)
+    with out.open("w", encoding="utf-8") as fh:
+        gen = await backend.agenerate_code(prompt=prompt, language=lang, on_code=_file_sink(fh))
+        if gen.get("success") and not gen.get("streamed"):
+            # what streamed in is not the final code (retry / unfenced answer)
+            fh.seek(0)
+            fh.truncate()
+            fh.write(gen["code"])
+    if not gen.get("success"):
+        out.unlink()
+        return gen, None
+    _write_meta(out, prompt, lang, ts)
+    return gen, out
+
 def prompt_from_file(prompt_path: str) -> str:
     p = Path(prompt_path)
     if not p.exists():
         raise FileNotFoundError(f"Prompt file not found: {p}")
     return p.read_text(encoding="utf-8").strip()
 
+def collect_prompt_files(spec: str) -> List[Path]:
+    """A prompt file, a directory (its *.txt files) or a glob pattern -> prompt files."""
+    p = Path(spec)
+    if p.is_dir():
+        files = sorted(p.glob("*.txt"))
+    elif p.exists():
+        files = [p]
+    else:
+        files = sorted(Path(f) for f in glob.glob(spec) if Path(f).is_file())
+    if not files:
+        raise FileNotFoundError(f"Prompt file not found: {p}")
+    return files
+
 def generate_with_ai(prompt: str, backend: AIBackend, language: str) -> Dict:
     return backend.generate_code(prompt=prompt, language=language)
 
-def attempt_evolve(out_path: Path, backend: AIBackend, prompt: str) -> Path:
+def attempt_evolve(out_path: Path, backend: AIBackend, prompt: str, code: Optional[str] = None) -> Tuple[Path, str]:
+    """Sync wrapper around aattempt_evolve."""
+    return backend.run(aattempt_evolve(out_path, backend, prompt, code=code))
+
+async def aattempt_evolve(out_path: Path, backend: AIBackend, prompt: str, code: Optional[str] = None) -> Tuple[Path, str]:
     """
     Iterative repair:
     - analyze file
     - if issues, call backend.repair_code with analysis
     - save repaired file, re-analyze
     - stop when metrics_ok or reach MAX_EVOLVE_ITER
+
+    code is the current content of out_path (read from disk if omitted); it is
+    carried in memory between iterations and files are only written for the
+    artifacts the analyzers need. Returns (final path, final code).
     """
     current_path = out_path
+    if code is None:
+        code = out_path.read_text(encoding="utf-8")
     for iteration in range(0, MAX_EVOLVE_ITER):
-        report = analyze_file(current_path)
-        ok = metrics_ok(report)
+        ok, report = await acheck_file(current_path, code)
         print(f"[evolve] iteration={iteration} ok={ok}")
         if ok:
             break
-        code_text = current_path.read_text(encoding="utf-8")
+        lang = "python" if current_path.suffix == ".py" else "javascript"
+        new_path = current_path.with_name(current_path.stem + f"_r{iteration+1}" + current_path.suffix)
         # ask AI to repair
         print("[evolve] Requesting AI repair...")
-        res = backend.repair_code(code_text, analysis_report=report, language="python" if current_path.suffix == ".py" else "javascript")
+        report = _portable_report(report, current_path)
+        on_disk = None
+        if REPAIR_CANDIDATES > 1:
+            res = await backend.arepair_code_variants(code, analysis_report=report, n=REPAIR_CANDIDATES, language=lang)
+        else:
+            # streamed into the new artifact while it arrives, like the first generation
+            with new_path.open("w", encoding="utf-8") as fh:
+                res = await backend.arepair_code(code, analysis_report=report, language=lang, on_code=_file_sink(fh))
+            if res.get("streamed"):
+                on_disk = res["code"]
         if not res.get("success"):
             print("[evolve] AI repair failed:", res.get("error"))
+            new_path.unlink(missing_ok=True)
+            break
+        candidates = res.get("candidates") or [res["code"]]
+        if all(c == code for c in candidates):
+            print("[evolve] repair was no-op, stopping")
+            new_path.unlink(missing_ok=True)
             break
-        repaired_code = res["code"]
+        repaired_code = candidates[0]
+        if len(candidates) > 1:
+            # keep the first variant that passes; otherwise fall back to the first one
+            for idx, cand in enumerate(candidates):
+                new_path.write_text(cand, encoding="utf-8")
+                on_disk = cand
+                if (await acheck_file(new_path, cand))[0]:
+                    print(f"[evolve] candidate {idx} passes analysis")
+                    repaired_code = cand
+                    break
         # save as new file
-        new_path = current_path.with_name(current_path.stem + f"_r{iteration+1}" + current_path.suffix)
-        new_path.write_text(repaired_code, encoding="utf-8")
-        (new_path.with_suffix(new_path.suffix + ".meta.json")).write_text(json.dumps({"repaired_by_ai": True, "iter": iteration+1}), encoding="utf-8")
+        if on_disk != repaired_code:
+            new_path.write_text(repaired_code, encoding="utf-8")
+        (new_path.with_suffix(new_path.suffix + ".meta.json")).write_bytes(_json_bytes({"repaired_by_ai": True, "iter": iteration+1}))
         current_path = new_path
-    return current_path
-
-def main(prompt_file: Optional[str] = None):
-    if prompt_file is None and len(sys.argv) > 1:
-        prompt_file = sys.argv[1]
-    if not prompt_file:
-        print("Usage: python -m arifi_protocol_runner.arifi_protocol_runner <prompt-file>")
-        sys.exit(1)
+        code = repaired_code
+    return current_path, code
 
-    print("🔮 Arifi-01 Protocol Runner (AI-enabled)")
-    prompt = prompt_from_file(prompt_file)
+async def process_prompt(prompt_path: Path, backend: AIBackend, tag: str = "") -> Optional[Dict]:
+    """Generate, repair and analyze one prompt file. Returns None if generation failed."""
+    prompt = prompt_from_file(str(prompt_path))
     lang = detect_language_from_prompt(prompt)
-    print(f"[info] prompt language detected: {lang}")
-
-    backend = AIBackend(model=AI_MODEL)
-
-    # 1) Generate initial code (AI or stub)
-    gen = generate_with_ai(prompt, backend=backend, language=lang)
-    if not gen.get("success"):
-        print("[error] generation failed:", gen.get("error"))
-        sys.exit(1)
+    print(f"[info] {prompt_path.name}: prompt language detected: {lang}")
 
-    code = gen["code"]
-    out_path = save_artifacts(code, prompt, lang)
+    # 1) Generate initial code (AI or stub), streamed straight into the artifact
+    gen, out_path = await astream_artifacts(prompt, backend=backend, lang=lang, tag=tag)
+    if out_path is None:
+        print(f"[error] {prompt_path.name}: generation failed:", gen.get("error"))
+        return None
     print(f"✅ Kode berhasil dibuat: {out_path}")
 
+    return await _evolve_and_analyze(out_path, gen["code"], backend, prompt, prompt_path)
+
+async def _evolve_and_analyze(out_path: Path, code: str, backend: AIBackend, prompt: str, prompt_path: Path) -> Dict:
     # 2) Analyze and iteratively repair
-    final_path = attempt_evolve(out_path, backend=backend, prompt=prompt)
+    final_path, final_code = await aattempt_evolve(out_path, backend=backend, prompt=prompt, code=code)
 
     # 3) Final analysis
-    final_report = analyze_file(final_path)
-    print("📊 Final analysis:")
-    print(json.dumps(final_report, indent=2))
+    final_report = await aanalyze_file(final_path, final_code)
+    return {"prompt_file": str(prompt_path), "path": str(final_path), "report": final_report}
+
+async def _gather_bounded(coros) -> list:
+    """asyncio.gather with at most MAX_CONCURRENT_PROMPTS running at once."""
+    sem = asyncio.Semaphore(MAX_CONCURRENT_PROMPTS)
+
+    async def bounded(coro):
+        async with sem:
+            return await coro
+
+    return await asyncio.gather(*(bounded(c) for c in coros))
+
+async def process_prompts(prompt_paths: List[Path], backend: AIBackend) -> List[Optional[Dict]]:
+    """
+    Run process_prompt for all prompt files concurrently, at most
+    MAX_CONCURRENT_PROMPTS at a time, so their API calls overlap.
+    """
+    multi = len(prompt_paths) > 1
+    return await _gather_bounded(process_prompt(p, backend, tag=_prompt_tag(i, p) if multi else "") for i, p in enumerate(prompt_paths))
+
+def _prompt_tag(index: int, prompt_path: Path) -> str:
+    # the index keeps prompts with the same file name (prompts/*/task.txt) apart
+    return f"{index}_{prompt_path.stem}"
+
+async def _closing(backend: AIBackend, coro):
+    """Await coro, then close the backend's HTTP client on the same loop."""
+    try:
+        return await coro
+    finally:
+        await backend.aclose()
+
+def _batch_manifest(batch_id: str) -> Path:
+    return _output_dir() / f"batch_{batch_id}.json"
+
+def submit_prompt_batch(prompt_paths: List[Path], backend: AIBackend) -> str:
+    """
+    Submit generation for all prompt files through the OpenAI Batch API and
+    record which prompt is which in a manifest next to the artifacts.
+    Returns the batch id to pass to collect_prompt_batch later.
+    """
+    prompts = [prompt_from_file(str(p)) for p in prompt_paths]
+    languages = [detect_language_from_prompt(p) for p in prompts]
+    batch_id = backend.submit_batch(prompts, languages=languages)
+    manifest = {"batch_id": batch_id, "prompt_files": [str(p) for p in prompt_paths], "prompts": prompts, "languages": languages}
+    _batch_manifest(batch_id).write_bytes(_json_bytes(manifest, indent=True))
+    return batch_id
+
+async def collect_prompt_batch(batch_id: str, backend: AIBackend) -> Optional[List[Optional[Dict]]]:
+    """
+    Fetch the results of a submitted batch, save them as artifacts and run the
+    usual repair loop + final analysis on each. Returns None while the batch is
+    still running.
+    """
+    manifest_path = _batch_manifest(batch_id)
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"no manifest at {manifest_path}; was it submitted with --batch?")
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    gens = await backend.apoll_batch(batch_id, count=len(manifest["prompts"]))
+    if gens is None:
+        return None
+
+    async def finish(i: int, gen: Dict) -> Optional[Dict]:
+        prompt_path = Path(manifest["prompt_files"][i])
+        if not gen.get("success"):
+            print(f"[error] {prompt_path.name}: generation failed:", gen.get("error"))
+            return None
+        prompt, lang = manifest["prompts"][i], manifest["languages"][i]
+        out_path = save_artifacts(gen["code"], prompt, lang, tag=_prompt_tag(i, prompt_path))
+        print(f"✅ Kode berhasil dibuat: {out_path}")
+        return await _evolve_and_analyze(out_path, gen["code"], backend, prompt, prompt_path)
+
+    return await _gather_bounded(finish(i, g) for i, g in enumerate(gens))
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m arifi_protocol_runner",
+        description="Arifi-01 Protocol Runner (AI-enabled)",
+    )
+    parser.add_argument("prompt_file", nargs="?", help="prompt file, directory of *.txt prompt files, or glob pattern")
+    parser.add_argument("--no-cache", action="store_true", help="always query the AI backend, bypassing the local response cache")
+    parser.add_argument("--batch", action="store_true", help="submit the prompts to the OpenAI Batch API (50%% cheaper, results within 24h) and exit")
+    parser.add_argument("--collect", metavar="BATCH_ID", help="fetch the results of a batch submitted with --batch and continue with repair/analysis")
+    args = parser.parse_args(argv)
+    if not args.prompt_file and not args.collect:
+        parser.error("a prompt file is required unless --collect is given")
+    return args
 
-    print("✨ Done. Artifacts in:", OUTPUT_DIR)
+def main(prompt_file: Optional[str] = None, use_cache: bool = True, batch: bool = False, collect: Optional[str] = None):
+    if prompt_file is None and collect is None:
+        args = parse_args()
+        prompt_file = args.prompt_file
+        use_cache = not args.no_cache
+        batch = args.batch
+        collect = args.collect
+
+    print("🔮 Arifi-01 Protocol Runner (AI-enabled)")
+    backend = AIBackend(model=AI_MODEL, use_cache=use_cache)
+
+    if collect:
+        try:
+            results = asyncio.run(_closing(backend, collect_prompt_batch(collect, backend)))
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"[error] batch {collect}:", e)
+            sys.exit(1)
+        if results is None:
+            print(f"[info] batch {collect} is still running; try again later")
+            return
+    else:
+        prompt_paths = collect_prompt_files(prompt_file)
+        if len(prompt_paths) > 1:
+            print(f"[info] {len(prompt_paths)} prompts")
+        if batch:
+            try:
+                batch_id = submit_prompt_batch(prompt_paths, backend)
+            except RuntimeError as e:
+                print("[error] batch submission failed:", e)
+                sys.exit(1)
+            finally:
+                backend.close()
+            print(f"📦 Batch submitted: {batch_id}")
+            print(f"   collect with: --collect {batch_id}")
+            return
+        results = asyncio.run(_closing(backend, process_prompts(prompt_paths, backend)))
+
+    for result in results:
+        if result is None:
+            continue
+        print(f"📊 Final analysis ({Path(result['path']).name}):" if len(results) > 1 else "📊 Final analysis:")
+        print(_json_bytes(result["report"], indent=True).decode("utf-8"))
+
+    if any(r is None for r in results):
+        sys.exit(1)
+    print("✨ Done. Artifacts in:", _output_dir())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()